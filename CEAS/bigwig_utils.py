@@ -0,0 +1,592 @@
+"""Module Description
+
+Copyright (c) 2026 Tao Liu <vladimir.liu@gmail.com>
+
+This code is free software; you can redistribute it and/or modify it
+under the terms of the BSD License (see the file COPYING included with
+the distribution).
+
+@status:  experimental
+@version: $Revision$
+@author:  Tao Liu
+@contact: vladimir.liu@gmail.com
+
+This module contains functions that read binned signal profiles from bigWIG files,
+through bx-python or its own batched block reader.
+"""
+
+# ------------------------------------
+# Python modules
+# ------------------------------------
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+try:
+    from numba import njit, prange
+except ImportError:     # numba is optional; _reduce_sites falls back to np.add.reduceat
+    njit = None
+
+# ------------------------------------
+# constants
+# ------------------------------------
+MAX_SPAN = 1000000  # maximum envelope of the sites fetched together in summarize_sites
+MAX_GAP = 100000    # sites farther than this from the previous one start a new fetch
+BLOCK_CACHE_SIZE = 64*1024*1024    # bytes of inflated data blocks cached per BigWigBlockReader
+BIGWIG_MAGIC = 0x888FFC26
+
+# sums and valid counts of the bins from a zoom level, as in bx-python's SummarizedData
+ZoomSummary = namedtuple('ZoomSummary', ['sum_data', 'valid_count'])
+
+# ------------------------------------
+# classes
+# ------------------------------------
+class BigWigBlockReader:
+    """Light-weight bigWIG reader fetching the data blocks of a query in one batch
+
+    The R-tree index is walked to find the data blocks overlapping a query, and the
+    blocks are then read and inflated together by batched_block_read, on a pool of
+    threads if threads > 1. The inflated blocks are kept in a LRU cache of at most
+    max_bytes keyed by their file offsets, so the blocks shared by nearby queries are
+    read once. The sections are unpacked with NumPy instead of value by value. All
+    reads use pread, so a reader can be shared by threads.
+
+    The values follow the bigWIG specification: the i-th value of a fixedStep section
+    covers itemSpan bases from start + i*itemStep. bx-python places it at
+    start + i*itemSpan instead, so the two disagree on fixedStep sections whose span
+    differs from their step; otherwise get_as_array returns the same as bx-python's.
+
+    get_as_array has the interface of bx-python's BigWigFile.get_as_array, so the
+    functions of this module accept either reader.
+    """
+
+    def __init__(self, fn, threads=1, max_bytes=BLOCK_CACHE_SIZE):
+        self.fd = os.open(fn, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(self.fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        try:
+            self._read_header(fn)
+        except Exception:
+            os.close(self.fd)
+            raise
+        self.pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        self.max_bytes = max_bytes
+        self.blocks = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def _read_header(self, fn):
+        """Read the header, zoom levels and chromosome tree, and set up the record dtypes"""
+        header = _pread(self.fd, 64, 0)
+        if len(header) == 64 and struct.unpack('<I', header[:4])[0] == BIGWIG_MAGIC:
+            self.endian = '<'
+        elif len(header) == 64 and struct.unpack('>I', header[:4])[0] == BIGWIG_MAGIC:
+            self.endian = '>'
+        else:
+            raise ValueError("%s is not a bigWIG file" %fn)
+        (magic, version, n_zooms, chrom_tree_offset, data_offset, index_offset, field_count, defined_field_count,
+         autosql_offset, summary_offset, self.uncompress_buf_size, reserved) = struct.unpack(self.endian + 'IHHQQQHHQQIQ', header)
+        self.index_offset = index_offset
+
+        # zoom levels: (reduction level, data offset, index offset)
+        zooms = _pread(self.fd, 24*n_zooms, 64)
+        self.zoom_levels = []
+        for i in range(n_zooms):
+            level, reserved, zoom_data_offset, zoom_index_offset = struct.unpack_from(self.endian + 'IIQQ', zooms, 24*i)
+            self.zoom_levels.append((level, zoom_data_offset, zoom_index_offset))
+
+        self.chroms = {}
+        magic, block_size, key_size, val_size, item_count, reserved = struct.unpack(self.endian + 'IIIIQQ', _pread(self.fd, 32, chrom_tree_offset))
+        self._read_chrom_tree(chrom_tree_offset + 32, key_size)
+
+        self.section_dtypes = {
+            1: np.dtype([('start', self.endian + 'u4'), ('end', self.endian + 'u4'), ('val', self.endian + 'f4')]),
+            2: np.dtype([('start', self.endian + 'u4'), ('val', self.endian + 'f4')]),
+            3: np.dtype(self.endian + 'f4'),
+        }
+        self.zoom_dtype = np.dtype([('chrom', self.endian + 'u4'), ('start', self.endian + 'u4'), ('end', self.endian + 'u4'),
+                                    ('valid_count', self.endian + 'u4'), ('min', self.endian + 'f4'), ('max', self.endian + 'f4'),
+                                    ('sum_data', self.endian + 'f4'), ('sum_squares', self.endian + 'f4')])
+        self.leaf_dtype = np.dtype([('start_chrom', self.endian + 'u4'), ('start', self.endian + 'u4'),
+                                    ('end_chrom', self.endian + 'u4'), ('end', self.endian + 'u4'),
+                                    ('offset', self.endian + 'u8'), ('size', self.endian + 'u8')])
+        self.node_dtype = np.dtype([('start_chrom', self.endian + 'u4'), ('start', self.endian + 'u4'),
+                                    ('end_chrom', self.endian + 'u4'), ('end', self.endian + 'u4'),
+                                    ('offset', self.endian + 'u8')])
+
+    def _read_chrom_tree(self, offset, key_size):
+        """Read the chromosome B+ tree node at offset into self.chroms, name: (id, size)"""
+        is_leaf, reserved, count = struct.unpack(self.endian + 'BBH', _pread(self.fd, 4, offset))
+        if is_leaf:
+            item = struct.Struct(self.endian + '%dsII' %key_size)
+            data = _pread(self.fd, item.size*count, offset + 4)
+            for i in range(count):
+                key, chrom_id, chrom_size = item.unpack_from(data, item.size*i)
+                self.chroms[key.rstrip(b'\0')] = (chrom_id, chrom_size)
+        else:
+            item = struct.Struct(self.endian + '%dsQ' %key_size)
+            data = _pread(self.fd, item.size*count, offset + 4)
+            for i in range(count):
+                self._read_chrom_tree(item.unpack_from(data, item.size*i)[1], key_size)
+
+    def find_blocks(self, chrom_id, start, end, index_offset=None):
+        """Return the (offsets, sizes) of the data blocks overlapping [start, end) of chrom_id
+
+        index_offset is the offset of the R-tree index to search, the index of the base-level
+        data by default.
+        """
+        if index_offset is None:
+            index_offset = self.index_offset
+        offsets = []
+        sizes = []
+        nodes = [index_offset + 48]     # the root follows the 48 bytes of the index header
+        while nodes:
+            offset = nodes.pop()
+            is_leaf, reserved, count = struct.unpack(self.endian + 'BBH', _pread(self.fd, 4, offset))
+            dtype = self.leaf_dtype if is_leaf else self.node_dtype
+            items = np.frombuffer(_pread(self.fd, dtype.itemsize*count, offset + 4), dtype=dtype)
+            # (chrom_id, start) < (end_chrom, end) and (chrom_id, end) > (start_chrom, start)
+            overlap = ((chrom_id < items['end_chrom']) | ((chrom_id == items['end_chrom']) & (start < items['end']))) & \
+                      ((chrom_id > items['start_chrom']) | ((chrom_id == items['start_chrom']) & (end > items['start'])))
+            if is_leaf:
+                offsets.extend(items['offset'][overlap].tolist())
+                sizes.extend(items['size'][overlap].tolist())
+            else:
+                nodes.extend(items['offset'][overlap][::-1].tolist())
+        return offsets, sizes
+
+    def read_blocks(self, offsets, sizes):
+        """Return the inflated data blocks at offsets, reading only the ones not in the cache"""
+        with self.lock:
+            blocks = [self.blocks.get(offset) for offset in offsets]
+            for offset, block in zip(offsets, blocks):
+                if block is not None:
+                    self.blocks.move_to_end(offset)
+        missing = [i for i, block in enumerate(blocks) if block is None]
+        if not missing:
+            return blocks
+        data = batched_block_read(self.fd, [offsets[i] for i in missing], [sizes[i] for i in missing], self.pool)
+        if self.uncompress_buf_size:
+            if self.pool is not None:
+                data = list(self.pool.map(zlib.decompress, data))
+            else:
+                data = [zlib.decompress(block) for block in data]
+        with self.lock:
+            for i, block in zip(missing, data):
+                blocks[i] = block
+                if offsets[i] not in self.blocks:
+                    self.blocks[offsets[i]] = block
+                    self.nbytes += len(block)
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= len(self.blocks.popitem(last=False)[1])
+        return blocks
+
+    def get_as_array(self, chrom, start, end):
+        """Return the base-level values of [start, end) of chrom as a float32 array, NaN where no data
+
+        None is returned if chrom (bytes) is not in the file.
+        """
+        try:
+            chrom_id = self.chroms[chrom][0]
+        except KeyError:
+            return None
+        arr = np.full(end - start, np.nan, dtype=np.float32)
+        for block in self.read_blocks(*self.find_blocks(chrom_id, start, end)):
+            pos = 0
+            while pos < len(block):
+                sec_chrom, sec_start, sec_end, step, span, tp, reserved, count = struct.unpack_from(self.endian + 'IIIIIBBH', block, pos)
+                pos += 24
+                dtype = self.section_dtypes[tp]
+                items = np.frombuffer(block, dtype=dtype, count=count, offset=pos)
+                pos += dtype.itemsize*count
+                if sec_chrom != chrom_id:
+                    continue
+                if tp == 1:     # bedGraph
+                    starts = items['start'].astype(np.int64)
+                    ends = items['end'].astype(np.int64)
+                    vals = items['val']
+                elif tp == 2:   # variableStep
+                    starts = items['start'].astype(np.int64)
+                    ends = starts + span
+                    vals = items['val']
+                else:           # fixedStep
+                    starts = sec_start + step*np.arange(count, dtype=np.int64)
+                    ends = starts + span
+                    vals = items
+                _fill_intervals(arr, start, starts, ends, vals)
+        return arr
+
+    def zoom_records(self, chrom, start, end, level):
+        """Return the records of a zoom level overlapping [start, end) of chrom sorted by start
+
+        None is returned if chrom (bytes) is not in the file.
+
+        Parameters:
+        1. chrom: chromosome name (bytes)
+        2. start: start of the region
+        3. end: end of the region
+        4. level: reduction level of one of the zoom levels
+        """
+        try:
+            chrom_id = self.chroms[chrom][0]
+        except KeyError:
+            return None
+        index_offset = {zoom[0]: zoom[2] for zoom in self.zoom_levels}[level]
+        blocks = self.read_blocks(*self.find_blocks(chrom_id, start, end, index_offset))
+        records = np.concatenate([np.frombuffer(block, dtype=self.zoom_dtype) for block in blocks] or [np.empty(0, self.zoom_dtype)])
+        records = records[(records['chrom'] == chrom_id) & (records['start'] < end) & (records['end'] > start)]
+        return records[np.argsort(records['start'], kind='stable')]
+
+    def summarize(self, chrom, start, end, summary_size):
+        """Return the ZoomSummary of summary_size bins equally dividing [start, end) of chrom
+
+        The records of the best zoom level, the coarsest with a reduction level not above
+        half the bin size, are apportioned to the bins by their overlaps as bx-python does.
+        None is returned if chrom (str) is not in the file or no zoom level is fine enough;
+        get_as_array is then the way to go.
+        """
+        level = _best_zoom_level([zoom[0] for zoom in self.zoom_levels], (end - start)//summary_size//2)
+        if level is None:
+            return None
+        records = self.zoom_records(_encode(chrom), start, end, level)
+        if records is None:
+            return None
+        return ZoomSummary(*_zoom_sums(records, _site_edges([start], [end - start], summary_size)[0]))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.blocks.clear()
+        os.close(self.fd)
+
+# ------------------------------------
+# functions
+# ------------------------------------
+if hasattr(os, 'pread'):
+    _pread = os.pread
+else:
+    _pread_lock = threading.Lock()
+    def _pread(fd, size, offset):
+        """os.pread for the platforms without it, serializing the seek and read"""
+        with _pread_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, size)
+
+def batched_block_read(fd, offsets, sizes, pool=None):
+    """Return the bytes at the given offsets and sizes of a file descriptor
+
+    The reads are independent preads, which are issued together from the threads of
+    pool if given, so that the storage gets them as one deep queue of requests.
+    """
+    if pool is None:
+        return [_pread(fd, size, offset) for offset, size in zip(offsets, sizes)]
+    return list(pool.map(_pread, [fd]*len(offsets), sizes, offsets))
+
+def _fill_intervals(arr, start, starts, ends, vals):
+    """Set arr[s-start:e-start] to v for each (s, e, v), clipped to arr, without a Python loop"""
+    starts = np.maximum(starts, start) - start
+    ends = np.minimum(ends, start + len(arr)) - start
+    keep = ends > starts
+    starts = starts[keep]
+    lengths = ends[keep] - starts
+    if not len(lengths):
+        return
+    shifts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    arr[shifts + np.arange(lengths.sum())] = np.repeat(vals[keep], lengths)
+
+def _zoom_sums(records, edges):
+    """Return the sums and valid counts of zoom records in the bins delimited by edges (along the last axis)
+
+    A record spreads its sum and count evenly over its bases, so the cumulative sum and
+    count are piecewise linear through the record ends and interpolate at the edges.
+    """
+    if not len(records):
+        shape = edges.shape[:-1] + (edges.shape[-1] - 1,)
+        return np.zeros(shape), np.zeros(shape)
+    xp = np.column_stack((records['start'], records['end'])).ravel().astype(np.float64)
+    sums = []
+    for field in ('sum_data', 'valid_count'):
+        total = np.cumsum(records[field], dtype=np.float64)
+        fp = np.column_stack((total - records[field], total)).ravel()
+        sums.append(np.diff(np.interp(edges, xp, fp), axis=-1))
+    return sums
+
+def summarize_bigwig(bw, chrom, start, end, bins):
+    """Return the average signals of the bins equally dividing [start, end) of chrom
+
+    The bins without any valid value get NaN. None is returned if no bin has a value.
+
+    If a zoom level of the bigWIG file has a reduction level of at most half the bin
+    size, the bins are summarized from the zoom level, moving a fraction of the bytes
+    of the base-level data. The averages are then approximate at the bin edges, where
+    the zoom records are apportioned by their overlaps. Finer bins are averaged
+    exactly from the base-level values.
+
+    A file name is opened with BigWigBlockReader, which differs from bx-python's
+    BigWigFile on fixedStep sections whose span differs from their step (see
+    BigWigBlockReader). It is opened for this call only and closed before
+    returning; pass an opened reader or BigWigFile to summarize many regions.
+
+    Parameters:
+    1. bw: BigWigBlockReader, bx-python BigWigFile or the name of a bigWIG file
+    2. chrom: chromosome name (str or bytes)
+    3. start: start of the region
+    4. end: end of the region
+    5. bins: number of bins
+    """
+    if isinstance(bw, str):
+        reader = BigWigBlockReader(bw)
+        try:
+            return summarize_bigwig(reader, chrom, start, end, bins)
+        finally:
+            reader.close()
+    if _best_zoom_level(_zoom_resolutions(bw), (end - start)//bins//2) is not None:
+        if isinstance(chrom, bytes):
+            chrom = chrom.decode()
+        return _summarize(bw, chrom, start, end, bins)
+    if isinstance(chrom, str):
+        chrom = _encode(chrom)
+    return _summarize_bytes(bw, chrom, start, end, bins)
+
+def _zoom_resolutions(bw):
+    """Return the reduction levels of the zoom levels of an opened bigWIG file, read from its header at opening"""
+    if isinstance(bw, BigWigBlockReader):
+        return [zoom[0] for zoom in bw.zoom_levels]
+    return [level.reduction_level for level in bw.level_list]
+
+def _best_zoom_level(levels, desired):
+    """Return the largest reduction level not above desired, or None if all are above it"""
+    levels = [level for level in levels if level <= desired]
+    return max(levels) if levels else None
+
+@lru_cache(maxsize=256)
+def _encode(chrom):
+    """Return the bytes of a chromosome name, shared by all the calls with the same name"""
+    return chrom.encode()
+
+def _summarize_bytes(bw, chrom_bytes, start, end, bins):
+    """Fast path of summarize_bigwig for an opened BigWigFile and a bytes chromosome name
+
+    The base-level values of [start, end) are fetched at once and reduced to the bins
+    by _reduce_sites, so the bin averages are exact.
+    """
+    arr = bw.get_as_array(chrom_bytes, start, end)
+    if arr is None:
+        return None
+    return _reduce_bins(arr, bins)
+
+def _reduce_bins(arr, bins):
+    """Return the NaN-aware averages of the bins equally dividing arr as a list, or None if all NaN"""
+    means = _reduce_sites(arr, _site_edges([0], [len(arr)], bins))[0]
+    if np.isnan(means).all():
+        return None
+    return means.tolist()
+
+def _site_edges(offsets, lengths, bins):
+    """Return the bin edges (sites x bins+1) of the sites at the offsets of a fetched array
+
+    The edges are computed in integers, floor(i*length/bins), so that they are exact
+    for any length rather than drifting with floating point rounding.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    return offsets[:, None] + (np.arange(bins+1, dtype=np.int64)*lengths[:, None])//bins
+
+def _reduce_sites(arr, edges):
+    """Return the NaN-aware averages (sites x bins) of arr in the bins delimited by the rows of edges
+
+    The bins without any valid value get NaN. The compiled kernel _reduce_bins_jit is used
+    if numba is available; otherwise every site is reduced with np.add.reduceat.
+    """
+    n_sites = edges.shape[0]
+    bins = edges.shape[1] - 1
+    sums = np.empty((n_sites, bins))
+    counts = np.empty((n_sites, bins), dtype=np.int64)
+    if _reduce_bins_jit is not None:
+        _reduce_bins_jit(arr, edges, sums, counts)
+    else:
+        valid = ~np.isnan(arr)
+        arr0 = np.where(valid, arr, 0.0)
+        for i in range(n_sites):
+            lo = edges[i, 0]
+            hi = edges[i, -1]
+            if hi == lo:    # zero-length site, left all NaN as by the kernel
+                sums[i] = 0.0
+                counts[i] = 0
+                continue
+            sums[i] = np.add.reduceat(arr0[lo:hi], edges[i, :-1] - lo, dtype=np.float64)
+            counts[i] = np.add.reduceat(valid[lo:hi], edges[i, :-1] - lo, dtype=np.int64)
+        counts[np.diff(edges) == 0] = 0     # reduceat returns the element at the edge for empty bins
+    return np.divide(sums, counts, out=np.full((n_sites, bins), np.nan), where=counts > 0)
+
+if njit is not None:
+    # fastmath without the 'nnan' and 'ninf' flags, which would let LLVM drop the isnan test
+    @njit(parallel=True, fastmath={'reassoc', 'contract', 'arcp', 'nsz', 'afn'}, cache=True)
+    def _reduce_bins_jit(arr, edges, out_sum, out_cnt):
+        """Write the sums and counts of the non-NaN values of arr in the bins delimited by the rows of edges"""
+        for i in prange(edges.shape[0]):
+            for b in range(edges.shape[1] - 1):
+                s = 0.0
+                c = 0
+                for j in range(edges[i, b], edges[i, b+1]):
+                    v = arr[j]
+                    if not np.isnan(v):
+                        s += v
+                        c += 1
+                out_sum[i, b] = s
+                out_cnt[i, b] = c
+else:
+    _reduce_bins_jit = None
+
+def summarize_sites(bw, chroms, starts, ends, bins, threads=1):
+    """Return the bin averages of many sites, fetching nearby sites together
+
+    The sites are sorted by chromosome and start, and swept into windows spanning at
+    most MAX_SPAN bp (a single longer site makes its own window). The base-level
+    values of each window are fetched with one get_as_array call and sliced per site,
+    so that overlapping sites do not decompress the same bigWIG blocks again.
+
+    If bw is a file name or a BigWigBlockReader and a zoom level of the file has a
+    reduction level of at most half the bin size of the shortest site, the zoom records
+    of the windows are fetched instead of the base-level values, as in summarize_bigwig.
+    The bin averages are then approximate at the bin edges.
+
+    If bw is a file name, it is read with BigWigBlockReader. This follows the bigWIG
+    specification on fixedStep sections whose span differs from their step, where
+    bx-python's BigWigFile misplaces the values, so the two give different profiles
+    for such files.
+
+    With threads > 1, the windows are read and decoded by a pool of threads sharing
+    one BigWigBlockReader, and bw must then be a file name or a BigWigBlockReader.
+
+    Ret: a 2D array (sites x bins) of the bin averages in the order of the sites. The
+    bins without any valid value are NaN, so are all the bins of the sites without data.
+
+    Parameters:
+    1. bw: BigWigBlockReader, bx-python BigWigFile or the name of a bigWIG file
+    2. chroms: chromosome names (str) of the sites
+    3. starts: starts of the sites (sequence or int array)
+    4. ends: ends of the sites (sequence or int array)
+    5. bins: number of bins
+    6. threads: number of threads reading and decoding the windows
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    lengths = ends - starts
+    if len(lengths) and np.all(lengths == lengths[0]):
+        template = _site_edges([0], lengths[:1], bins)[0]     # relative bin edges shared by all the sites
+    else:
+        template = None
+    windows = _sweep_windows(chroms, starts.tolist(), ends.tolist())
+    results = np.full((len(chroms), bins), np.nan)
+    reader = BigWigBlockReader(bw) if isinstance(bw, str) else bw
+    try:
+        level = None
+        if isinstance(reader, BigWigBlockReader) and len(lengths):
+            level = _best_zoom_level([zoom[0] for zoom in reader.zoom_levels], int(lengths.min())//bins//2)
+        if level is None:
+            def fetch(window):
+                return reader.get_as_array(_encode(window[0]), window[1], window[2])
+            summarize = _summarize_window
+        else:
+            def fetch(window):
+                return reader.zoom_records(_encode(window[0]), window[1], window[2], level)
+            summarize = _summarize_zoom_window
+        for window, data in zip(windows, _fetch_windows(reader, fetch, windows, threads)):
+            if data is not None:
+                results[window[3]] = summarize(data, window, starts, ends, bins, template)
+    finally:
+        if reader is not bw:
+            reader.close()
+    return results
+
+def _fetch_windows(reader, fetch, windows, threads):
+    """Yield fetch(window) for the windows in order, the base-level values or zoom records of the windows
+
+    With threads > 1, at most 4*threads windows are read and decoded ahead by the worker
+    threads. Only the reading and decoding are done in the workers; the windows are
+    reduced in the calling thread, since numba's TBB threading layer hangs at exit if
+    parallel kernels are launched from other threads.
+    """
+    if threads > 1:
+        if not isinstance(reader, BigWigBlockReader):
+            raise ValueError("summarize_sites needs a file name or a BigWigBlockReader to read with multiple threads")
+        chunk = 4 * threads
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for i in range(0, len(windows), chunk):
+                yield from pool.map(fetch, windows[i:i+chunk])
+    else:
+        for window in windows:
+            yield fetch(window)
+
+def _sweep_windows(chroms, starts, ends):
+    """Group the sites into windows of nearby sites on the same chromosome
+
+    Ret: a list of (chrom, window start, window end, indices of the sites in the window)
+    """
+    n = len(chroms)
+    order = sorted(range(n), key=lambda i: (chroms[i], starts[i]))
+    windows = []
+    i = 0
+    while i < n:
+        chrom = chroms[order[i]]
+        win_start = starts[order[i]]
+        win_end = ends[order[i]]
+        j = i + 1
+        while j < n:
+            k = order[j]
+            if chroms[k] != chrom or starts[k] - win_end > MAX_GAP or max(win_end, ends[k]) - win_start > MAX_SPAN:
+                break
+            win_end = max(win_end, ends[k])
+            j += 1
+        windows.append((chrom, win_start, win_end, order[i:j]))
+        i = j
+    return windows
+
+def _summarize_window(arr, window, starts, ends, bins, template=None):
+    """Return the bin averages (sites x bins) of the sites in a window from the base-level values of the window
+
+    starts and ends are the int64 arrays of all the sites. If all the sites have the same
+    length, template is their relative bin edges, which are then only shifted per site.
+    """
+    sites = window[3]
+    if template is not None:
+        edges = (starts[sites] - window[1])[:, None] + template
+    else:
+        edges = _site_edges(starts[sites] - window[1], ends[sites] - starts[sites], bins)
+    return _reduce_sites(arr, edges)
+
+def _summarize_zoom_window(records, window, starts, ends, bins, template=None):
+    """Return the bin averages (sites x bins) of the sites in a window from the zoom records of the window
+
+    The arguments are those of _summarize_window, with the zoom records in place of the
+    base-level values.
+    """
+    sites = window[3]
+    if template is not None:
+        edges = starts[sites][:, None] + template
+    else:
+        edges = _site_edges(starts[sites], ends[sites] - starts[sites], bins)
+    sums, counts = _zoom_sums(records, edges)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+def _summarize(bw, chrom, start, end, bins):
+    """Return the average signals of the bins from the zoom levels of the bigWIG file
+
+    The sums and valid counts of all the bins are taken from a single summarize call,
+    which bx-python (or BigWigBlockReader) answers from the best zoom level of the
+    bigWIG file. Unlike _summarize_bytes, chrom is a str here as bx-python's summarize
+    encodes it itself.
+    """
+    s = bw.summarize(chrom, start, end, bins)
+    if s is None:
+        return None
+    means = np.divide(s.sum_data, s.valid_count, out=np.full(bins, np.nan), where=s.valid_count > 0)
+    if np.isnan(means).all():
+        return None
+    return means.tolist()